@@ -1,74 +1,368 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import hashlib
+import orjson
+import diskcache
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from collections import deque
 from datetime import datetime
 import re
 import os
-from groq import Groq
+import time
+import uuid
+
+LLM_CACHE_DIR = "/tmp/supermind_llm_cache"
+LLM_CACHE_SIZE_LIMIT = 512 * 1024 * 1024
+LLM_CACHE_EXPIRE = 24 * 60 * 60
+
+CHAT_HISTORY_DIR = os.path.expanduser("~/.cache/supermind_history")
+CHAT_HISTORY_LIMIT = 50
+CHAT_HISTORY_SHOWN = 10
+CHAT_HISTORY_MAX_AGE = 30 * 24 * 60 * 60
+CHAT_HISTORY_MAX_FILES = 1000
+
+_CLIENT_ID_RE = re.compile(r"[0-9a-f]{32}")
+_CHAT_FIELDS = ('question', 'answer', 'timestamp')
+
+_CSS = """
+    <style>
+        .main { background-color: #1a1a1a; color: #ffffff; padding: 2rem; }
+        .stTitle { color: #ffffff !important; font-size: 2.5rem !important; font-weight: 600 !important; margin-bottom: 2rem !important; }
+        .metric-card { background-color: #2d2d2d; border-radius: 10px; padding: 1.5rem; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); transition: transform 0.2s ease; }
+        .metric-card:hover { transform: translateY(-5px); }
+        .metric-value { font-size: 2rem; font-weight: 700; color: #ffffff; margin: 0.5rem 0; }
+        .metric-label { font-size: 1rem; color: #b3b3b3; margin-bottom: 0.5rem; }
+        .stButton > button { background-color: #ff4b4b !important; color: white !important; border: none !important; padding: 0.75rem 1.5rem !important; border-radius: 8px !important; font-weight: 600 !important; transition: all 0.3s ease !important; }
+        .stButton > button:hover { background-color: #ff3333 !important; transform: translateY(-2px); }
+        .chat-container { background-color: #2d2d2d; border-radius: 10px; padding: 1.5rem; margin-top: 1rem; }
+        .chat-message { padding: 1rem; border-radius: 8px; margin-bottom: 1rem; background-color: #404040; }
+        #MainMenu {visibility: hidden;}
+        footer {visibility: hidden;}
+        .stTabs [data-baseweb="tab-list"] { gap: 2rem; background-color: #2d2d2d; padding: 1rem; border-radius: 10px; }
+        .stTabs [data-baseweb="tab"] { color: #ffffff !important; background-color: transparent !important; border: none !important; font-weight: 500; }
+        .stTextInput > div > div { background-color: #2d2d2d !important; color: #ffffff !important; border-radius: 8px !important; }
+        .chat-history { max-height: 400px; overflow-y: auto; margin-top: 2rem; padding: 1rem; background-color: #2d2d2d; border-radius: 10px; }
+        .viz-container { background-color: #2d2d2d; border-radius: 10px; padding: 1.5rem; margin-top: 2rem; }
+    </style>
+"""
+
+_COMMON_LAYOUT = dict(
+    plot_bgcolor='#2d2d2d',
+    paper_bgcolor='#2d2d2d',
+    font=dict(color='#ffffff'),
+    height=400,
+    margin=dict(t=50, b=50),
+    showlegend=False,
+    xaxis=dict(gridcolor='#404040'),
+    yaxis=dict(gridcolor='#404040')
+)
+
+_DEFAULT_METRICS_DF = pd.DataFrame({
+    'post_type': ['All Types', 'Carousel Posts', 'Video Posts'],
+    'engagement_rate': [2.36, 2.62, 2.10],
+    'likes': [2660.9, 3200, 2500],
+    'comments': [107.4, 150, 80],
+    'leads': [100, 120, 90]
+})
+
+_ERROR_METRICS_DF = pd.DataFrame({
+    'post_type': ['All Types'],
+    'engagement_rate': [2.36],
+    'likes': [2660.9],
+    'comments': [107.4],
+    'leads': [100]
+})
+
+_METRIC_MARKERS = tuple(f"**{post_type}:**" for post_type in ('Images', 'Videos', 'Carousels'))
+_METRICS_RE = re.compile(r"\*\*(?P<pt>Images|Videos|Carousels):\*\* (\d+) posts, average engagement rate: ([\d.]+)%, average likes: ([\d,.]+), average comments: ([\d,.]+), average shares: ([\d,.]+)")
+
+@st.cache_resource
+def get_session():
+    """Shared HTTP session so the Langflow connection is kept alive between calls"""
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json"})
+    # Only connection failures and 502/503 are retried. A read timeout or a 504 means the
+    # flow may still be running upstream, so re-POSTing it would bill a second execution
+    retries = Retry(
+        total=2,
+        connect=2,
+        read=0,
+        status=2,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503],
+        allowed_methods=frozenset({"POST"})
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+@st.cache_resource
+def get_disk_cache():
+    """Langflow responses shared across sessions, workers and restarts"""
+    return diskcache.Cache(LLM_CACHE_DIR, size_limit=LLM_CACHE_SIZE_LIMIT)
+
+def _flow_request(message):
+    """Build the Langflow run URL, payload and headers for a message or list of messages"""
+    base_api_url = st.secrets["BASE_API_URL"]
+    langflow_id = st.secrets["LANGFLOW_ID"]
+    flow_id = st.secrets["FLOW_ID"]
+    application_token = st.secrets["APPLICATION_TOKEN"]
+    tweaks = json.loads(st.secrets["DEFAULT_TWEAKS"])
+    
+    api_url = f"{base_api_url}/lf/{langflow_id}/api/v1/run/{flow_id}"
+    
+    payload = {
+        "output_type": "chat",
+        "input_type": "chat",
+        "tweaks": tweaks
+    }
+    if isinstance(message, list):
+        payload["input_values"] = message
+    else:
+        payload["input_value"] = message
+    
+    headers = {
+        "Authorization": f"Bearer {application_token}"
+    }
+    
+    return api_url, payload, headers
+
+def _cache_key(message):
+    """Normalize a query so case and whitespace drift share a cache entry"""
+    return message.strip().lower()
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _stored_flow(cache_key):
+    """In-memory layer over the shared disk cache; misses raise KeyError and are not cached"""
+    result = get_disk_cache().get(hashlib.sha256(cache_key.encode()).hexdigest())
+    if result is None:
+        raise KeyError(cache_key)
+    return result
+
+def _lookup_flow(message):
+    """Return the stored Langflow response for a message, or None on a miss"""
+    try:
+        return _stored_flow(_cache_key(message))
+    except KeyError:
+        return None
+
+def _has_message(result):
+    """Whether a Langflow response carries answer text; safe to call from worker threads"""
+    try:
+        return any(_iter_message_paths(result))
+    except Exception:
+        return False
+
+def _store_flow(message, result):
+    """Write a Langflow response to the shared disk cache, skipping responses without text"""
+    # An empty or malformed reply would otherwise be served from cache for a full day
+    if not _has_message(result):
+        return
+    disk_key = hashlib.sha256(_cache_key(message).encode()).hexdigest()
+    get_disk_cache().set(disk_key, result, expire=LLM_CACHE_EXPIRE)
+
+def clear_flow_cache():
+    """Drop every stored Langflow response and parsed metrics frame, on disk and in memory"""
+    get_disk_cache().clear()
+    _stored_flow.clear()
+    _parse_metrics_df.clear()
+
+def _cached_flow(message):
+    """Call the Langflow workflow; results are cached per normalized query"""
+    result = _lookup_flow(message)
+    if result is not None:
+        return result
+    
+    api_url, payload, headers = _flow_request(message)
+    response = get_session().post(api_url, data=orjson.dumps(payload), headers=headers, timeout=(5, 60))
+    response.raise_for_status()
+    result = orjson.loads(response.content)
+    _store_flow(message, result)
+    return result
+
+def _post_flow_batch(messages):
+    """Send several messages in one batched run request, one response per message"""
+    api_url, payload, headers = _flow_request(list(messages))
+    response = get_session().post(api_url, data=orjson.dumps(payload), headers=headers, timeout=(5, 120))
+    response.raise_for_status()
+    outputs = orjson.loads(response.content).get('outputs', [])
+    if len(outputs) != len(messages):
+        raise ValueError("Batch response did not contain one output per input")
+    return [{'outputs': [output]} for output in outputs]
+
+def _fetch_flow(message):
+    """Call the cached workflow without touching the UI, returning (response, error)"""
+    try:
+        return _cached_flow(message), None
+    except Exception as e:
+        return None, e
 
 def run_flow(message):
-    """Run the Langflow workflow with the given message"""
+    """Run the Langflow workflow with the given message, or a list of messages"""
+    if isinstance(message, list):
+        return _run_flow_batch(message)
+    
     try:
-        base_api_url = st.secrets["BASE_API_URL"]
-        langflow_id = st.secrets["LANGFLOW_ID"]
-        flow_id = st.secrets["FLOW_ID"]
-        application_token = st.secrets["APPLICATION_TOKEN"]
-        tweaks = json.loads(st.secrets["DEFAULT_TWEAKS"])
-        
-        api_url = f"{base_api_url}/lf/{langflow_id}/api/v1/run/{flow_id}"
-        
-        payload = {
-            "input_value": message,
-            "output_type": "chat",
-            "input_type": "chat",
-            "tweaks": tweaks
-        }
-        
-        headers = {
-            "Authorization": f"Bearer {application_token}",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.post(api_url, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        # Errors are raised out of the cached call so failures are never cached
+        return _cached_flow(message)
     except Exception as e:
         st.error(f"API Error: {str(e)}")
         return None
 
+def run_flows(messages):
+    """Run several independent Langflow queries concurrently, preserving order"""
+    if not messages:
+        return []
+    
+    # Streamlit elements can't be emitted from worker threads, so errors are reported here
+    with ThreadPoolExecutor(max_workers=min(8, len(messages))) as executor:
+        results = list(executor.map(_fetch_flow, messages))
+
+    responses = []
+    for response, error in results:
+        if error is not None:
+            st.error(f"API Error: {str(error)}")
+        responses.append(response)
+    return responses
+
+def _secret_flag(name):
+    """Read a boolean secret, so a quoted "false" in secrets.toml does not count as enabled"""
+    value = st.secrets.get(name, False)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+def _run_flow_batch(messages):
+    """Run a list of messages in one request when batching is enabled, else concurrently"""
+    responses = [_lookup_flow(message) for message in messages]
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if not missing:
+        return responses
+    missing_messages = [messages[i] for i in missing]
+    
+    try:
+        batch_enabled = len(missing) > 1 and _secret_flag("LANGFLOW_BATCH")
+    except Exception:
+        # Missing secrets are reported per query by run_flows
+        batch_enabled = False
+    
+    fetched = None
+    if batch_enabled:
+        try:
+            fetched = _post_flow_batch(missing_messages)
+        except requests.HTTPError as e:
+            # 400/422 means the server rejected the input_values shape; anything else is a real failure
+            if e.response is None or e.response.status_code not in (400, 422):
+                st.error(f"API Error: {str(e)}")
+                fetched = [None] * len(missing)
+        except ValueError:
+            # Server ignored input_values and answered a single run
+            pass
+        except Exception as e:
+            st.error(f"API Error: {str(e)}")
+            fetched = [None] * len(missing)
+        else:
+            for message, response in zip(missing_messages, fetched):
+                _store_flow(message, response)
+    
+    if fetched is None:
+        fetched = run_flows(missing_messages)
+    for i, response in zip(missing, fetched):
+        responses[i] = response
+    return responses
+
+def run_flow_stream(message):
+    """Yield the Langflow answer as it is generated; raises if the stream breaks after output starts"""
+    cached = _lookup_flow(message)
+    if cached is not None:
+        text = extract_message_from_response(cached)
+        if text:
+            yield text
+        return
+
+    chunks = []
+    result = None
+    message_text = None
+    try:
+        api_url, payload, headers = _flow_request(message)
+        with get_session().post(api_url, params={"stream": "true"}, data=orjson.dumps(payload),
+                                headers=headers, stream=True, timeout=(5, 60)) as response:
+            response.raise_for_status()
+            if response.headers.get("Content-Type", "").startswith("application/json"):
+                # Server answered with a regular, non-streamed response
+                result = orjson.loads(response.content)
+            else:
+                for line in response.iter_lines():
+                    if line.startswith(b"data:"):
+                        line = line[5:]
+                    if not line.strip():
+                        continue
+                    event = orjson.loads(line)
+                    data = event.get("data") or {}
+                    if event.get("event") == "token":
+                        chunk = data.get("chunk")
+                        if chunk:
+                            chunks.append(chunk)
+                            yield chunk
+                    elif event.get("event") == "add_message":
+                        # The user's input is echoed back as a message too; keep only the reply
+                        if data.get("sender") != "User" and data.get("text"):
+                            message_text = data["text"]
+                    elif event.get("event") == "end":
+                        result = data.get("result")
+    except requests.HTTPError as e:
+        # Only a server that can't stream gets the regular run endpoint; auth failures, gateway
+        # errors and timeouts are raised once instead of running the flow a second time
+        if e.response is None or e.response.status_code not in (404, 405, 415):
+            raise
+        text = extract_message_from_response(_cached_flow(message))
+        if text:
+            yield text
+        return
+
+    result_text = extract_message_from_response(result) if isinstance(result, dict) else None
+    if chunks:
+        text = "".join(chunks)
+    else:
+        # Flows whose LLM component doesn't emit tokens only report the final message
+        text = result_text or message_text
+        if text:
+            yield text
+
+    if text:
+        if not result_text:
+            result = {'outputs': [{'results': {'message': {'text': text}}}]}
+        _store_flow(message, result)
+
+def _iter_message_paths(response):
+    """Lazily yield candidate message values from the response, in priority order"""
+    for output in response.get('outputs', []):
+        yield output.get('results', {}).get('message', {}).get('text')
+        yield output.get('artifacts', {}).get('message')
+        
+        for sub_output in output.get('outputs', []):
+            if ('results' in sub_output and 
+                'message' in sub_output['results'] and
+                'text' in sub_output['results']['message']):
+                yield sub_output['results']['message']['text']
+        
+        for message in output.get('messages', []):
+            if 'message' in message:
+                yield message['message']
+
 def extract_message_from_response(response):
     """Extract the actual message content from the nested response structure"""
     try:
         if not response:
             return None
-            
-        if 'outputs' in response:
-            for output in response['outputs']:
-                paths = [
-                    output.get('results', {}).get('message', {}).get('text'),
-                    output.get('artifacts', {}).get('message'),
-                ]
-                
-                if 'outputs' in output:
-                    for sub_output in output['outputs']:
-                        if ('results' in sub_output and 
-                            'message' in sub_output['results'] and
-                            'text' in sub_output['results']['message']):
-                            paths.append(sub_output['results']['message']['text'])
-                
-                if 'messages' in output:
-                    for message in output['messages']:
-                        if 'message' in message:
-                            paths.append(message['message'])
-                
-                for path in paths:
-                    if path is not None:
-                        return path
-
-        return None
+        
+        # Stops walking the response as soon as the first populated path is found
+        return next((path for path in _iter_message_paths(response) if path is not None), None)
     except Exception as e:
         st.error(f"Error extracting message: {str(e)}")
         return None
@@ -83,53 +377,119 @@ def parse_metrics_from_message(message):
         'shares': []
     }
     
-    post_types = ['Images', 'Videos', 'Carousels']
+    # Plain substring checks are far cheaper than a failed regex scan on Q&A style answers
+    if not any(marker in message for marker in _METRIC_MARKERS):
+        return metrics
     
-    for post_type in post_types:
-        pattern = rf"\*\*{post_type}:\*\* (\d+) posts, average engagement rate: ([\d.]+)%, average likes: ([\d,.]+), average comments: ([\d,.]+), average shares: ([\d,.]+)"
-        match = re.search(pattern, message)
-        if match:
-            metrics['post_types'].append(post_type)
-            metrics['engagement_rates'].append(float(match.group(2)))
-            metrics['likes'].append(float(match.group(3).replace(',', '')))
-            metrics['comments'].append(float(match.group(4).replace(',', '')))
-            metrics['shares'].append(float(match.group(5).replace(',', '')))
+    # Single scan over the message; only the first entry per post type is kept
+    for match in _METRICS_RE.finditer(message):
+        post_type = match['pt']
+        if post_type in metrics['post_types']:
+            continue
+        metrics['post_types'].append(post_type)
+        metrics['engagement_rates'].append(float(match.group(3)))
+        metrics['likes'].append(float(match.group(4).replace(',', '')))
+        metrics['comments'].append(float(match.group(5).replace(',', '')))
+        metrics['shares'].append(float(match.group(6).replace(',', '')))
     
     return metrics
 
+# max_entries only bounds the in-memory layer; the pickles Streamlit persists to disk are
+# never evicted and are removed only by clear_flow_cache
+@st.cache_data(persist="disk", max_entries=1024, show_spinner=False)
+def _parse_metrics_df(text):
+    """Parse the message text into a metrics DataFrame; errors propagate so they aren't persisted"""
+    metrics = parse_metrics_from_message(text)
+    if metrics['post_types']:
+        return pd.DataFrame({
+            'post_type': metrics['post_types'],
+            'engagement_rate': metrics['engagement_rates'],
+            'likes': metrics['likes'],
+            'comments': metrics['comments'],
+            'shares': metrics['shares']
+        })
+    
+    return _DEFAULT_METRICS_DF
+
 def extract_metrics_from_text(text):
     """Extract metrics from the text and create a structured DataFrame"""
     try:
-        metrics = parse_metrics_from_message(text)
-        if metrics['post_types']:
-            return pd.DataFrame({
-                'post_type': metrics['post_types'],
-                'engagement_rate': metrics['engagement_rates'],
-                'likes': metrics['likes'],
-                'comments': metrics['comments'],
-                'shares': metrics['shares']
-            })
-        
-        data = {
-            'post_type': ['All Types', 'Carousel Posts', 'Video Posts'],
-            'engagement_rate': [2.36, 2.62, 2.10],
-            'likes': [2660.9, 3200, 2500],
-            'comments': [107.4, 150, 80],
-            'leads': [100, 120, 90]
-        }
-        return pd.DataFrame(data)
+        return _parse_metrics_df(text)
     except Exception as e:
         st.error(f"Error extracting metrics: {str(e)}")
-        return pd.DataFrame({
-            'post_type': ['All Types'],
-            'engagement_rate': [2.36],
-            'likes': [2660.9],
-            'comments': [107.4],
-            'leads': [100]
-        })
+        return _ERROR_METRICS_DF.copy()
+
+def get_client_id():
+    """Per-browser id kept in the URL so a refresh finds the same chat history"""
+    if 'client_id' not in st.session_state:
+        client_id = st.query_params.get("client")
+        if not client_id or not _CLIENT_ID_RE.fullmatch(client_id):
+            client_id = uuid.uuid4().hex
+            st.query_params["client"] = client_id
+        st.session_state.client_id = client_id
+    return st.session_state.client_id
+
+def _chat_history_path(client_id):
+    """File holding one client's chat history"""
+    return os.path.join(CHAT_HISTORY_DIR, f"{client_id}.json")
+
+def load_chat_history(client_id):
+    """Load this client's persisted chat history into a bounded deque"""
+    history = deque(maxlen=CHAT_HISTORY_LIMIT)
+    try:
+        with open(_chat_history_path(client_id)) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return history
+    
+    if isinstance(entries, list):
+        history.extend(
+            entry for entry in entries
+            if isinstance(entry, dict) and all(isinstance(entry.get(field), str) for field in _CHAT_FIELDS)
+        )
+    return history
+
+def save_chat_history(client_id, history):
+    """Persist this client's chat history so it survives a page refresh"""
+    path = _chat_history_path(client_id)
+    try:
+        os.makedirs(CHAT_HISTORY_DIR, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a half-written file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(history), f)
+        os.replace(tmp_path, path)
+        _prune_chat_histories()
+    except OSError as e:
+        st.warning(f"Could not save chat history: {str(e)}")
+
+def _prune_chat_histories():
+    """Delete history files untouched for CHAT_HISTORY_MAX_AGE, keeping at most CHAT_HISTORY_MAX_FILES"""
+    entries = []
+    with os.scandir(CHAT_HISTORY_DIR) as it:
+        for entry in it:
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+    
+    entries.sort(reverse=True)
+    cutoff = time.time() - CHAT_HISTORY_MAX_AGE
+    for i, (mtime, path) in enumerate(entries):
+        if i >= CHAT_HISTORY_MAX_FILES or mtime < cutoff:
+            try:
+                os.remove(path)
+            except OSError:
+                # Another session may have removed it already
+                pass
 
 def create_visualizations(df):
     """Create visualizations with consistent styling"""
+    import plotly.graph_objects as go
+    
+    engagement_text = df['engagement_rate'].map('{:.2f}%'.format)
+    likes_text = df['likes'].map('{:,.0f}'.format)
+    
     chart_col1, chart_col2 = st.columns(2)
     
     with chart_col1:
@@ -138,20 +498,13 @@ def create_visualizations(df):
             x=df['post_type'],
             y=df['engagement_rate'],
             marker_color='#ff4b4b',
-            text=df['engagement_rate'].apply(lambda x: f'{x:.2f}%'),
+            text=engagement_text,
             textposition='outside'
         ))
         
         fig_engagement.update_layout(
             title='Engagement Rate by Post Type',
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font=dict(color='#ffffff'),
-            height=400,
-            margin=dict(t=50, b=50),
-            showlegend=False,
-            xaxis=dict(gridcolor='#404040'),
-            yaxis=dict(gridcolor='#404040')
+            **_COMMON_LAYOUT
         )
         
         st.plotly_chart(fig_engagement, use_container_width=True)
@@ -162,24 +515,215 @@ def create_visualizations(df):
             x=df['post_type'],
             y=df['likes'],
             marker_color='#ff4b4b',
-            text=df['likes'].apply(lambda x: f'{x:,.0f}'),
+            text=likes_text,
             textposition='outside'
         ))
         
         fig_likes.update_layout(
             title='Average Likes by Post Type',
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font=dict(color='#ffffff'),
-            height=400,
-            margin=dict(t=50, b=50),
-            showlegend=False,
-            xaxis=dict(gridcolor='#404040'),
-            yaxis=dict(gridcolor='#404040')
+            **_COMMON_LAYOUT
         )
         
         st.plotly_chart(fig_likes, use_container_width=True)
 
+@st.fragment
+def _render_performance_tab():
+    """Post type performance analysis tab"""
+    st.markdown("""
+        <div class="metric-container">
+            <h2 style='color: #ffffff; margin-bottom: 1.5rem;'>Post Type Performance Analysis</h2>
+        </div>
+    """, unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        post_type = st.selectbox(
+            "Select Post Type",
+            ["All Types", "Carousel", "Reels", "Static Images", "Stories"]
+        )
+    with col2:
+        metrics = st.multiselect(
+            "Select Metrics",
+            ["Engagement Rate", "Likes", "Comments", "Shares"],
+            default=["Engagement Rate", "Likes"]
+        )
+
+    if st.button("Analyze Performance", type="primary"):
+        with st.spinner("Analyzing post performance..."):
+            if metrics:
+                queries = [f"Analyze the {metric.lower()} performance metrics for {post_type} posts" for metric in metrics]
+            else:
+                queries = [f"Analyze the performance metrics for {post_type} posts"]
+            responses = [r for r in run_flow(queries) if r]
+            
+            if responses:
+                try:
+                    msg = "\n\n".join(filter(None, map(extract_message_from_response, responses)))
+                    df = extract_metrics_from_text(msg)
+                    
+                    # KPI Cards
+                    st.markdown("<h3 style='color: #ffffff; margin: 2rem 0 1rem;'>Key Performance Indicators</h3>", unsafe_allow_html=True)
+                    
+                    kpi_cols = st.columns(4)
+                    kpis = [
+                        ("Average Engagement Rate", f"{df['engagement_rate'].mean():.2f}%"),
+                        ("Average Likes", f"{df['likes'].mean():,.0f}"),
+                        ("Average Comments", f"{df['comments'].mean():,.0f}"),
+                        ("Average Leads", f"{df['leads'].mean():,.0f}")
+                    ]
+                    
+                    for i, (label, value) in enumerate(kpis):
+                        with kpi_cols[i]:
+                            st.markdown(f"""
+                                <div class="metric-card">
+                                    <div class="metric-label">{label}</div>
+                                    <div class="metric-value">{value}</div>
+                                </div>
+                            """, unsafe_allow_html=True)
+                    
+                    # Insights
+                    st.markdown("<h3 style='color: #ffffff; margin: 2rem 0 1rem;'>Analysis Insights</h3>", unsafe_allow_html=True)
+                    st.markdown(f"""
+                        <div class="chat-container">
+                            {msg}
+                        </div>
+                    """, unsafe_allow_html=True)
+                    
+                    # Visualizations
+                    st.markdown("<h3 style='color: #ffffff; margin: 2rem 0 1rem;'>Performance Visualizations</h3>", unsafe_allow_html=True)
+                    create_visualizations(df)
+                    
+                except Exception as e:
+                    st.error(f"Error processing data: {str(e)}")
+            else:
+                st.error("Failed to get analysis results")
+
+@st.fragment
+def _render_qa_tab():
+    """Insights Q&A tab with chat history"""
+    st.markdown("""
+        <div class="metric-container">
+            <h2 style='color: #ffffff; margin-bottom: 1.5rem;'>Ask Questions & Get Insights</h2>
+        </div>
+    """, unsafe_allow_html=True)
+
+    st.markdown("""
+        <div style='color: #b3b3b3; margin-bottom: 1rem;'>
+            Example questions you can ask:
+            <ul>
+                <li>Which type of posts performed better and why?</li>
+                <li>What are the key factors affecting engagement rates?</li>
+                <li>How do carousel posts compare to video posts?</li>
+                <li>What are the best practices for improving engagement?</li>
+                <li>What time of day gets the most engagement?</li>
+                <li>What content themes are most successful?</li>
+            </ul>
+        </div>
+    """, unsafe_allow_html=True)
+
+    user_question = st.text_input("Enter your question", key="qa_input", 
+                                placeholder="Type your question here...")
+
+    if 'chat_history' not in st.session_state:
+        st.session_state.chat_history = load_chat_history(get_client_id())
+
+    if st.button("Get Insights", key="qa_button", type="primary"):
+        if user_question:
+            st.markdown(f"""
+                <div class="chat-container">
+                    <div class="chat-message">
+                        <strong>Question:</strong><br>{user_question}
+                    </div>
+                </div>
+            """, unsafe_allow_html=True)
+            st.markdown("<strong>Answer:</strong>", unsafe_allow_html=True)
+            insight, failed = None, False
+            try:
+                insight = st.write_stream(run_flow_stream(user_question))
+            except Exception as e:
+                # The stream broke partway; the truncated answer is not kept in the history
+                st.error(f"API Error: {str(e)}")
+                failed = True
+            if insight:
+                st.session_state.chat_history.append({
+                    "question": user_question,
+                    "answer": insight,
+                    "timestamp": datetime.now().strftime("%H:%M:%S")
+                })
+                save_chat_history(get_client_id(), st.session_state.chat_history)
+                
+                if len(st.session_state.chat_history) > 1:
+                    st.markdown("<h3 style='color: #ffffff; margin: 2rem 0 1rem;'>Previous Questions</h3>", unsafe_allow_html=True)
+                    with st.expander("View Chat History"):
+                        previous_chats = list(st.session_state.chat_history)[-CHAT_HISTORY_SHOWN - 1:-1]
+                        for chat in reversed(previous_chats):
+                            st.markdown(f"""
+                                <div class="chat-message">
+                                    <small>{chat['timestamp']}</small><br>
+                                    <strong>Q:</strong> {chat['question']}<br>
+                                    <strong>A:</strong> {chat['answer']}
+                                </div>
+                            """, unsafe_allow_html=True)
+            elif not failed:
+                st.error("Could not generate insights")
+        else:
+            st.warning("Please enter a question")
+
+@st.fragment
+def _render_trends_tab():
+    """Engagement trends tab"""
+    st.markdown("""
+        <div class="metric-container">
+            <h2 style='color: #ffffff; margin-bottom: 1.5rem;'>Engagement Trends Analysis</h2>
+        </div>
+    """, unsafe_allow_html=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        trend_period = st.selectbox(
+            "Select Time Period",
+            ["Last 7 days", "Last 30 days", "Last 3 months", "Last year"]
+        )
+    with col2:
+        trend_metric = st.selectbox(
+            "Select Metric",
+            ["Engagement Rate", "Likes", "Comments", "Shares"]
+        )
+    with col3:
+        comparison = st.checkbox("Compare with previous period")
+
+    if st.button("Analyze Trends", type="primary"):
+        query = f"Analyze the {trend_metric.lower()} trends for {trend_period.lower()}"
+        previous_query = f"Analyze the {trend_metric.lower()} trends for the period before the {trend_period.lower()}"
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # The previous period is fetched in the background while the current one streams
+            previous = executor.submit(_fetch_flow, previous_query) if comparison else None
+            
+            st.markdown("<strong>Trend Analysis:</strong>", unsafe_allow_html=True)
+            try:
+                if not st.write_stream(run_flow_stream(query)):
+                    st.error("Could not generate trend analysis")
+            except Exception as e:
+                st.error(f"API Error: {str(e)}")
+            
+            if previous is not None:
+                with st.spinner("Analyzing previous period..."):
+                    response, error = previous.result()
+                if error is not None:
+                    st.error(f"API Error: {str(error)}")
+                previous_insight = extract_message_from_response(response)
+                if previous_insight:
+                    st.markdown(f"""
+                        <div class="chat-container">
+                            <div class="chat-message">
+                                <strong>Previous Period:</strong><br>{previous_insight}
+                            </div>
+                        </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    st.error("Failed to analyze previous period")
+
 def main():
     st.set_page_config(
         page_title="Social Media Analytics Dashboard",
@@ -189,209 +733,25 @@ def main():
     )
 
     # Custom CSS (keeping the same styling)
-    st.markdown("""
-        <style>
-            .main { background-color: #1a1a1a; color: #ffffff; padding: 2rem; }
-            .stTitle { color: #ffffff !important; font-size: 2.5rem !important; font-weight: 600 !important; margin-bottom: 2rem !important; }
-            .metric-card { background-color: #2d2d2d; border-radius: 10px; padding: 1.5rem; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); transition: transform 0.2s ease; }
-            .metric-card:hover { transform: translateY(-5px); }
-            .metric-value { font-size: 2rem; font-weight: 700; color: #ffffff; margin: 0.5rem 0; }
-            .metric-label { font-size: 1rem; color: #b3b3b3; margin-bottom: 0.5rem; }
-            .stButton > button { background-color: #ff4b4b !important; color: white !important; border: none !important; padding: 0.75rem 1.5rem !important; border-radius: 8px !important; font-weight: 600 !important; transition: all 0.3s ease !important; }
-            .stButton > button:hover { background-color: #ff3333 !important; transform: translateY(-2px); }
-            .chat-container { background-color: #2d2d2d; border-radius: 10px; padding: 1.5rem; margin-top: 1rem; }
-            .chat-message { padding: 1rem; border-radius: 8px; margin-bottom: 1rem; background-color: #404040; }
-            #MainMenu {visibility: hidden;}
-            footer {visibility: hidden;}
-            .stTabs [data-baseweb="tab-list"] { gap: 2rem; background-color: #2d2d2d; padding: 1rem; border-radius: 10px; }
-            .stTabs [data-baseweb="tab"] { color: #ffffff !important; background-color: transparent !important; border: none !important; font-weight: 500; }
-            .stTextInput > div > div { background-color: #2d2d2d !important; color: #ffffff !important; border-radius: 8px !important; }
-            .chat-history { max-height: 400px; overflow-y: auto; margin-top: 2rem; padding: 1rem; background-color: #2d2d2d; border-radius: 10px; }
-            .viz-container { background-color: #2d2d2d; border-radius: 10px; padding: 1.5rem; margin-top: 2rem; }
-        </style>
-    """, unsafe_allow_html=True)
+    st.markdown(_CSS, unsafe_allow_html=True)
 
     st.title("📱 Social Media Performance Analytics")
 
+    with st.sidebar:
+        with st.expander("Admin"):
+            if st.button("Clear cache"):
+                clear_flow_cache()
+
     tab1, tab2, tab3 = st.tabs(["📊 Performance Analysis", "💡 Insights Q&A", "📈 Trends"])
 
     with tab1:
-        st.markdown("""
-            <div class="metric-container">
-                <h2 style='color: #ffffff; margin-bottom: 1.5rem;'>Post Type Performance Analysis</h2>
-            </div>
-        """, unsafe_allow_html=True)
-
-        col1, col2 = st.columns(2)
-        with col1:
-            post_type = st.selectbox(
-                "Select Post Type",
-                ["All Types", "Carousel", "Reels", "Static Images", "Stories"]
-            )
-        with col2:
-            metrics = st.multiselect(
-                "Select Metrics",
-                ["Engagement Rate", "Likes", "Comments", "Shares"],
-                default=["Engagement Rate", "Likes"]
-            )
-
-        if st.button("Analyze Performance", type="primary"):
-            with st.spinner("Analyzing post performance..."):
-                query = f"Analyze the performance metrics for {post_type} posts focusing on {', '.join(metrics)}"
-                response = run_flow(query)
-                
-                if response:
-                    try:
-                        df = extract_metrics_from_text(extract_message_from_response(response))
-                        
-                        # KPI Cards
-                        st.markdown("<h3 style='color: #ffffff; margin: 2rem 0 1rem;'>Key Performance Indicators</h3>", unsafe_allow_html=True)
-                        
-                        kpi_cols = st.columns(4)
-                        kpis = [
-                            ("Average Engagement Rate", f"{df['engagement_rate'].mean():.2f}%"),
-                            ("Average Likes", f"{df['likes'].mean():,.0f}"),
-                            ("Average Comments", f"{df['comments'].mean():,.0f}"),
-                            ("Average Leads", f"{df['leads'].mean():,.0f}")
-                        ]
-                        
-                        for i, (label, value) in enumerate(kpis):
-                            with kpi_cols[i]:
-                                st.markdown(f"""
-                                    <div class="metric-card">
-                                        <div class="metric-label">{label}</div>
-                                        <div class="metric-value">{value}</div>
-                                    </div>
-                                """, unsafe_allow_html=True)
-                        
-                        # Insights
-                        st.markdown("<h3 style='color: #ffffff; margin: 2rem 0 1rem;'>Analysis Insights</h3>", unsafe_allow_html=True)
-                        st.markdown(f"""
-                            <div class="chat-container">
-                                {extract_message_from_response(response)}
-                            </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # Visualizations
-                        st.markdown("<h3 style='color: #ffffff; margin: 2rem 0 1rem;'>Performance Visualizations</h3>", unsafe_allow_html=True)
-                        create_visualizations(df)
-                        
-                    except Exception as e:
-                        st.error(f"Error processing data: {str(e)}")
-                else:
-                    st.error("Failed to get analysis results")
+        _render_performance_tab()
 
     with tab2:
-        st.markdown("""
-            <div class="metric-container">
-                <h2 style='color: #ffffff; margin-bottom: 1.5rem;'>Ask Questions & Get Insights</h2>
-            </div>
-        """, unsafe_allow_html=True)
-
-        st.markdown("""
-            <div style='color: #b3b3b3; margin-bottom: 1rem;'>
-                Example questions you can ask:
-                <ul>
-                    <li>Which type of posts performed better and why?</li>
-                    <li>What are the key factors affecting engagement rates?</li>
-                    <li>How do carousel posts compare to video posts?</li>
-                    <li>What are the best practices for improving engagement?</li>
-                    <li>What time of day gets the most engagement?</li>
-                    <li>What content themes are most successful?</li>
-                </ul>
-            </div>
-        """, unsafe_allow_html=True)
-
-        user_question = st.text_input("Enter your question", key="qa_input", 
-                                    placeholder="Type your question here...")
-
-        if 'chat_history' not in st.session_state:
-            st.session_state.chat_history = []
-
-        if st.button("Get Insights", key="qa_button", type="primary"):
-            if user_question:
-                with st.spinner("Analyzing..."):
-                    response = run_flow(user_question)
-                    if response:
-                        insight = extract_message_from_response(response)
-                        if insight:
-                            st.session_state.chat_history.append({
-                                "question": user_question,
-                                "answer": insight,
-                                "timestamp": datetime.now().strftime("%H:%M:%S")
-                            })
-                            
-                            st.markdown(f"""
-                                <div class="chat-container">
-                                    <div class="chat-message">
-                                        <strong>Question:</strong><br>{user_question}
-                                    </div>
-                                    <div class="chat-message">
-                                        <strong>Answer:</strong><br>{insight}
-                                    </div>
-                                </div>
-                            """, unsafe_allow_html=True)
-                            
-                            if len(st.session_state.chat_history) > 1:
-                                st.markdown("<h3 style='color: #ffffff; margin: 2rem 0 1rem;'>Previous Questions</h3>", unsafe_allow_html=True)
-                                with st.expander("View Chat History"):
-                                    for chat in reversed(st.session_state.chat_history[:-1]):
-                                        st.markdown(f"""
-                                            <div class="chat-message">
-                                                <small>{chat['timestamp']}</small><br>
-                                                <strong>Q:</strong> {chat['question']}<br>
-                                                <strong>A:</strong> {chat['answer']}
-                                            </div>
-                                        """, unsafe_allow_html=True)
-                        else:
-                            st.error("Could not generate insights")
-                    else:
-                        st.error("Failed to get response")
-            else:
-                st.warning("Please enter a question")
+        _render_qa_tab()
 
     with tab3:
-        st.markdown("""
-            <div class="metric-container">
-                <h2 style='color: #ffffff; margin-bottom: 1.5rem;'>Engagement Trends Analysis</h2>
-            </div>
-        """, unsafe_allow_html=True)
-
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            trend_period = st.selectbox(
-                "Select Time Period",
-                ["Last 7 days", "Last 30 days", "Last 3 months", "Last year"]
-            )
-        with col2:
-            trend_metric = st.selectbox(
-                "Select Metric",
-                ["Engagement Rate", "Likes", "Comments", "Shares"]
-            )
-        with col3:
-            comparison = st.checkbox("Compare with previous period")
-
-        if st.button("Analyze Trends", type="primary"):
-            with st.spinner("Analyzing trends..."):
-                query = f"Analyze the {trend_metric.lower()} trends for {trend_period.lower()}"
-                if comparison:
-                    query += " and compare with the previous period"
-                    
-                response = run_flow(query)
-                if response:
-                    insight = extract_message_from_response(response)
-                    if insight:
-                        st.markdown(f"""
-                            <div class="chat-container">
-                                <div class="chat-message">
-                                    <strong>Trend Analysis:</strong><br>{insight}
-                                </div>
-                            </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.error("Could not generate trend analysis")
-                else:
-                    st.error("Failed to analyze trends")
+        _render_trends_tab()
 
     # Footer
     st.markdown("""